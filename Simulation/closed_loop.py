@@ -0,0 +1,320 @@
+"""Headless closed-loop testbed for the server's guidance rules.
+
+Each step projects the park around the simulated user into synthetic camera detections,
+runs them through the same detection_model/guidance.py helpers server.py uses, and applies the
+resulting instruction back to the user. No Tk window is opened.
+
+The simulated user mirrors client.py: they react once to each new spoken instruction and
+otherwise keep walking, stopped only by their cane. --no-guidance runs the same user ignoring
+every instruction, as a baseline for what the rules add.
+
+Run from the Simulation directory:  python closed_loop.py --episodes 500 --seed 1
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+from park import ENV_WIDTH, ENV_HEIGHT, MOVING_OBJECT_COUNT, static_objects, moving_objects, dijkstra
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "detection_model"))
+from guidance import HARMFUL_OBJECTS, harmful_label, zones_for_boxes, decide_instruction, should_send
+
+# Hazards lie on the ground: they do not block the path but should never be stepped on.
+hazard_objects = {
+    'Knife': {'label': 'knife'},
+    'Scissors': {'label': 'scissors'},
+}
+HAZARD_COUNT = 6
+
+# Object heights in metres (one grid cell is one metre wide).
+object_heights = {
+    'Tree': 3.0,
+    'Bench': 0.5,
+    'Wall': 2.0,
+    'Chair': 0.9,
+    'Dog': 0.5,
+    'Bike': 1.0,
+    'Knife': 0.1,
+    'Scissors': 0.1,
+}
+
+FRAME_W, FRAME_H = 640, 480
+FOCAL = 320  # pixels, roughly a 90 degree horizontal field of view
+CAMERA_HEIGHT = 1.2
+VIEW_DEPTH = 4
+GRID_ROWS, GRID_COLS = 5, 5
+
+DIRECTIONS = [(0, -1), (1, 0), (0, 1), (-1, 0)]  # clockwise: up, right, down, left
+# Chance that a turn goes toward the destination side rather than away from it; the rest is
+# exploration, so the user does not replay the same fixed loop around an obstacle.
+TURN_TOWARD_DESTINATION = 0.7
+
+
+def instruction_action(instruction):
+    """Map a server instruction to what the simulated user does after hearing it."""
+    if instruction.startswith("Harmful object") or instruction.startswith("Path is blocked"):
+        return "back"
+    if "move left or right" in instruction:
+        return "sidestep"
+    if "move right" in instruction:
+        return "right"
+    if "move left" in instruction:
+        return "left"
+    if "stop" in instruction or "alternate path" in instruction:
+        # A user told to stop cannot stand still forever; they turn to look for another way.
+        return "turn"
+    return "forward"
+
+
+class HeadlessPark:
+    def __init__(self, rng, max_steps, view_depth=VIEW_DEPTH, follow_guidance=True, harmful_objects=HARMFUL_OBJECTS):
+        self.rng = rng
+        self.harmful_objects = harmful_objects
+        self.max_steps = max_steps
+        self.view_depth = view_depth
+        self.follow_guidance = follow_guidance
+        self.env = [[None for _ in range(ENV_WIDTH)] for _ in range(ENV_HEIGHT)]
+        self.moving_objects_positions = []
+
+        while True:
+            self.user_x, self.user_y = self.get_random_empty_cell()
+            self.dest_x, self.dest_y = self.get_random_empty_cell()
+            distance = math.hypot(self.dest_x - self.user_x, self.dest_y - self.user_y)
+            if distance > ENV_WIDTH // 2:
+                break
+
+        self.generate_static_environment()
+        self.place_hazards()
+        self.place_moving_objects()
+
+        self.heading = self.heading_to_destination()
+        self.instruction_history = []
+        self.last_heard = None
+        self.steps = 0
+        self.collisions = 0
+        self.hazard_contacts = 0
+        self.instructions = Counter()
+        path = dijkstra(self.env, (self.user_x, self.user_y), (self.dest_x, self.dest_y))
+        self.optimal_steps = len(path) - 1 if path else None
+
+    def is_free(self, x, y):
+        return 0 <= x < ENV_WIDTH and 0 <= y < ENV_HEIGHT and (self.env[y][x] is None or self.env[y][x] in hazard_objects)
+
+    def get_random_empty_cell(self):
+        while True:
+            x, y = self.rng.randint(0, ENV_WIDTH-1), self.rng.randint(0, ENV_HEIGHT-1)
+            if self.env[y][x] is None and (x, y) not in self.moving_objects_positions:
+                return x, y
+
+    def get_random_unreserved_cell(self):
+        while True:
+            x, y = self.get_random_empty_cell()
+            if (x, y) != (self.user_x, self.user_y) and (x, y) != (self.dest_x, self.dest_y):
+                return x, y
+
+    def generate_static_environment(self):
+        for _ in range(60):
+            x, y = self.get_random_unreserved_cell()
+            self.env[y][x] = self.rng.choice(list(static_objects))
+
+    def place_hazards(self):
+        for _ in range(HAZARD_COUNT):
+            x, y = self.get_random_unreserved_cell()
+            self.env[y][x] = self.rng.choice(list(hazard_objects))
+
+    def place_moving_objects(self):
+        while len(self.moving_objects_positions) < MOVING_OBJECT_COUNT:
+            x, y = self.get_random_unreserved_cell()
+            self.env[y][x] = self.rng.choice(list(moving_objects))
+            self.moving_objects_positions.append((x, y))
+
+    def update_moving_objects(self):
+        new_positions = []
+        for (x, y) in self.moving_objects_positions:
+            obj = self.env[y][x]
+            self.env[y][x] = None
+
+            directions = [(-1,0), (1,0), (0,-1), (0,1)]
+            self.rng.shuffle(directions)
+            moved = False
+
+            for dx, dy in directions:
+                nx, ny = x + dx, y + dy
+                if (0 <= nx < ENV_WIDTH and 0 <= ny < ENV_HEIGHT and
+                    self.env[ny][nx] is None and (nx, ny) != (self.user_x, self.user_y) and (nx, ny) != (self.dest_x, self.dest_y) and (nx, ny) not in new_positions):
+                    self.env[ny][nx] = obj
+                    new_positions.append((nx, ny))
+                    moved = True
+                    break
+
+            if not moved:
+                self.env[y][x] = obj
+                new_positions.append((x, y))
+
+        self.moving_objects_positions = new_positions
+
+    def heading_to_destination(self):
+        dx, dy = self.dest_x - self.user_x, self.dest_y - self.user_y
+        if abs(dx) >= abs(dy):
+            return (1, 0) if dx > 0 else (-1, 0)
+        return (0, 1) if dy > 0 else (0, -1)
+
+    def synthetic_detections(self):
+        """Project objects in front of the user into (label, (x1, y1, x2, y2)) camera boxes."""
+        hx, hy = self.heading
+        rx, ry = -hy, hx  # the user's right-hand side
+        cx, horizon = FRAME_W / 2, FRAME_H / 2
+        detections = []
+        for forward in range(1, self.view_depth + 1):
+            depth = forward - 0.5  # near face of the cell
+            scale = FOCAL / depth
+            for lateral in range(-forward - 1, forward + 2):
+                x = self.user_x + hx * forward + rx * lateral
+                y = self.user_y + hy * forward + ry * lateral
+                if not (0 <= x < ENV_WIDTH and 0 <= y < ENV_HEIGHT):
+                    obj = 'Wall'  # the park boundary is visible to the camera like any wall
+                else:
+                    obj = self.env[y][x]
+                if obj is None:
+                    continue
+                x1 = cx + (lateral - 0.5) * scale
+                x2 = cx + (lateral + 0.5) * scale
+                if x2 <= 0 or x1 >= FRAME_W:
+                    continue
+                y1 = horizon - (object_heights[obj] - CAMERA_HEIGHT) * scale
+                y2 = horizon + CAMERA_HEIGHT * scale
+                label = hazard_objects[obj]['label'] if obj in hazard_objects else obj
+                detections.append((label, (x1, y1, x2, y2)))
+        return detections
+
+    def guidance_instruction(self):
+        detections = self.synthetic_detections()
+        harmful = harmful_label([label for label, _ in detections], self.harmful_objects)
+        zones_covered = zones_for_boxes([box for _, box in detections], FRAME_W, FRAME_H, GRID_ROWS, GRID_COLS)
+        instruction, _, _ = decide_instruction(zones_covered, harmful, GRID_ROWS, GRID_COLS)
+        return instruction
+
+    def try_move(self, dx, dy):
+        nx, ny = self.user_x + dx, self.user_y + dy
+        if not self.is_free(nx, ny):
+            # Bumping into something is feedback the user gets anyway (cane, contact); they turn away.
+            self.collisions += 1
+            self.turn()
+            return False
+        self.user_x, self.user_y = nx, ny
+        if self.env[ny][nx] in hazard_objects:
+            self.hazard_contacts += 1
+        return True
+
+    def turn(self):
+        # Turn a quarter, usually toward the side the destination lies on; the seeded rng
+        # sometimes picks the other side.
+        hx, hy = self.heading
+        rx, ry = -hy, hx
+        side = (self.dest_x - self.user_x) * rx + (self.dest_y - self.user_y) * ry
+        clockwise = side > 0 if side != 0 else self.rng.random() < 0.5
+        if self.rng.random() >= TURN_TOWARD_DESTINATION:
+            clockwise = not clockwise
+        index = DIRECTIONS.index(self.heading)
+        self.heading = DIRECTIONS[(index + (1 if clockwise else -1)) % 4]
+
+    def reaim(self):
+        # After a step, face the destination again only if the cell that way is open (the user
+        # checks with the cane); otherwise keep walking the detour heading.
+        hx, hy = self.heading_to_destination()
+        if self.is_free(self.user_x + hx, self.user_y + hy):
+            self.heading = (hx, hy)
+
+    def apply(self, action):
+        hx, hy = self.heading
+        rx, ry = -hy, hx
+        if action == "forward":
+            if self.try_move(hx, hy):
+                self.reaim()
+        elif action == "back":
+            if self.try_move(-hx, -hy):
+                self.turn()
+        elif action == "right":
+            self.try_move(rx, ry)
+        elif action == "left":
+            self.try_move(-rx, -ry)
+        elif action == "sidestep":
+            side = (self.dest_x - self.user_x) * rx + (self.dest_y - self.user_y) * ry
+            if side < 0 or not self.is_free(self.user_x + rx, self.user_y + ry):
+                rx, ry = -rx, -ry
+            self.try_move(rx, ry)
+        elif action == "turn":
+            self.turn()
+
+    def step(self):
+        instruction = self.guidance_instruction()
+        self.instructions[instruction] += 1
+        # Only what server.py sends reaches the client, and client.py only speaks an instruction
+        # when it differs from the last one. The user reacts once to each new instruction and
+        # otherwise keeps walking; the cane stops them at anything they walk into.
+        if self.follow_guidance and should_send(self.instruction_history, instruction) and instruction != self.last_heard:
+            self.last_heard = instruction
+            self.apply(instruction_action(instruction))
+        else:
+            self.apply("forward")
+        self.update_moving_objects()
+        self.steps += 1
+
+    def reached_destination(self):
+        return (self.user_x, self.user_y) == (self.dest_x, self.dest_y)
+
+    def run(self):
+        while self.steps < self.max_steps and not self.reached_destination():
+            self.step()
+        return self.reached_destination()
+
+
+def run_episodes(episodes, seed, max_steps, view_depth=VIEW_DEPTH, follow_guidance=True):
+    rng = random.Random(seed)
+    totals = Counter()
+    instructions = Counter()
+    efficiencies = []
+    begin = time.perf_counter()
+    for _ in range(episodes):
+        park = HeadlessPark(rng, max_steps, view_depth, follow_guidance)
+        reached = park.run()
+        totals["episodes"] += 1
+        totals["reached"] += reached
+        totals["steps"] += park.steps
+        totals["collisions"] += park.collisions
+        totals["hazard_contacts"] += park.hazard_contacts
+        instructions.update(park.instructions)
+        if reached and park.optimal_steps:
+            efficiencies.append(park.optimal_steps / park.steps)
+    elapsed = time.perf_counter() - begin
+    return totals, instructions, efficiencies, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive the server's guidance rules through the park simulation.")
+    parser.add_argument("--episodes", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-steps", type=int, default=4 * (ENV_WIDTH + ENV_HEIGHT))
+    parser.add_argument("--view-depth", type=int, default=VIEW_DEPTH, help="how many cells ahead the camera sees")
+    parser.add_argument("--no-guidance", action="store_true", help="baseline: the user ignores every instruction and relies on the cane")
+    args = parser.parse_args()
+
+    totals, instructions, efficiencies, elapsed = run_episodes(args.episodes, args.seed, args.max_steps, args.view_depth, not args.no_guidance)
+    episodes = totals["episodes"]
+    print(f"Episodes: {episodes}, steps: {totals['steps']} in {elapsed:.2f}s ({totals['steps'] / elapsed:.0f} steps/s)")
+    print(f"Reached destination: {totals['reached']}/{episodes} ({totals['reached'] / episodes * 100:.1f}%)")
+    if efficiencies:
+        print(f"Path efficiency vs Dijkstra (reached only): {sum(efficiencies) / len(efficiencies) * 100:.1f}%")
+    print(f"Collisions per episode: {totals['collisions'] / episodes:.2f}")
+    print(f"Hazard contacts per episode: {totals['hazard_contacts'] / episodes:.2f}")
+    print("Instructions issued:")
+    for instruction, count in instructions.most_common():
+        print(f"  {count:7d}  {instruction}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,58 +3,7 @@ import random
 import math
 from tkinter import ttk
 
-ENV_WIDTH = 20
-ENV_HEIGHT = 20
-CELL_SIZE = 30
-MOVING_OBJECT_COUNT = 7
-
-# Object types
-static_objects = {
-    'Tree': {'color': 'darkgreen', 'key': 'T'},
-    'Bench': {'color': 'sienna', 'key': 'B'},
-    'Wall': {'color': 'gray', 'key': 'W'},
-    'Chair': {'color': 'darkred', 'key': 'C'},
-}
-
-moving_objects = {
-    'Dog': {'color': 'orange', 'key': 'D'},
-    'Bike': {'color': 'blue', 'key': 'K'},
-}
-
-object_types = {**static_objects, **moving_objects}
-
-def dijkstra(grid, start, end):
-    width, height = len(grid[0]), len(grid)
-    dist = [[float('inf')] * width for _ in range(height)]
-    prev = [[None] * width for _ in range(height)]
-    dist[start[1]][start[0]] = 0
-    visited = [[False] * width for _ in range(height)]
-    queue = [(0, start)]
-
-    while queue:
-        queue.sort()
-        d, (x, y) = queue.pop(0)
-        if visited[y][x]:
-            continue
-        visited[y][x] = True
-
-        for dx, dy in [(-1,0),(1,0),(0,-1),(0,1)]:
-            nx, ny = x+dx, y+dy
-            if 0 <= nx < width and 0 <= ny < height:
-                if grid[ny][nx] in static_objects or grid[ny][nx] in moving_objects:
-                    continue
-                nd = d + 1
-                if nd < dist[ny][nx]:
-                    dist[ny][nx] = nd
-                    prev[ny][nx] = (x, y)
-                    queue.append((nd, (nx, ny)))
-
-    path = []
-    current = end
-    while current:
-        path.insert(0, current)
-        current = prev[current[1]][current[0]]
-    return path if path and path[0] == start else []
+from park import ENV_WIDTH, ENV_HEIGHT, CELL_SIZE, MOVING_OBJECT_COUNT, static_objects, moving_objects, object_types, dijkstra
 
 
 class SmartAssistantApp:
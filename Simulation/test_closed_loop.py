@@ -0,0 +1,19 @@
+import random
+
+from closed_loop import HeadlessPark, run_episodes
+
+
+def test_guidance_beats_no_guidance_baseline_on_fixed_seed():
+    guided, _, _, _ = run_episodes(episodes=50, seed=1, max_steps=160, follow_guidance=True)
+    baseline, _, _, _ = run_episodes(episodes=50, seed=1, max_steps=160, follow_guidance=False)
+    assert guided["collisions"] < 0.75 * baseline["collisions"]
+    assert guided["reached"] > baseline["reached"]
+
+
+def test_park_boundary_is_seen_as_wall():
+    park = HeadlessPark(random.Random(0), max_steps=1)
+    park.env = [[None] * len(row) for row in park.env]
+    park.user_x, park.user_y = 0, 0
+    park.heading = (0, -1)
+    labels = {label for label, _ in park.synthetic_detections()}
+    assert labels == {"Wall"}
@@ -0,0 +1,90 @@
+"""Detection-to-instruction rules shared by server.py and the simulation testbed.
+
+Kept free of camera, model and GUI imports so it can be driven by synthetic detections.
+"""
+
+HARMFUL_OBJECTS = ["knife", "scissors"]
+
+
+def harmful_label(labels, harmful_objects=HARMFUL_OBJECTS):
+    """Return the last label in detection order that is harmful, or None."""
+    found = None
+    for label in labels:
+        if label in harmful_objects:
+            found = label
+    return found
+
+
+def zones_for_boxes(boxes, frame_w, frame_h, grid_rows, grid_cols):
+    """Return the set of (row, col) grid zones touched by boxes given as (x1, y1, x2, y2) pixels."""
+    grid_w = frame_w / grid_cols
+    grid_h = frame_h / grid_rows
+    zones_covered = set()
+
+    for x1, y1, x2, y2 in boxes:
+        x1 = max(0, min(frame_w - 1, x1))
+        y1 = max(0, min(frame_h - 1, y1))
+        x2 = max(0, min(frame_w - 1, x2))
+        y2 = max(0, min(frame_h - 1, y2))
+
+        start_col = int(x1 // grid_w)
+        end_col = int(x2 // grid_w)
+        start_row = int(y1 // grid_h)
+        end_row = int(y2 // grid_h)
+
+        for row in range(start_row, end_row + 1):
+            for col in range(start_col, end_col + 1):
+                if 0 <= row < grid_rows and 0 <= col < grid_cols:
+                    zones_covered.add((row, col))
+
+    return zones_covered
+
+
+def decide_instruction(zones_covered, harmful_label, grid_rows, grid_cols):
+    """Return (instruction, safety_status, coverage_ratio) for one frame.
+
+    harmful_label is the harmful class seen in the frame, or None.
+    """
+    mid_row, mid_col = grid_rows // 2, grid_cols // 2
+    center_zone = (mid_row, mid_col)
+    left_cols = range(mid_col)
+    right_cols = range(mid_col + 1, grid_cols)
+
+    instruction = "Move forward"
+    coverage_ratio = len(zones_covered) / (grid_rows * grid_cols)
+
+    if harmful_label is not None:
+        safety_status = "Unsafe"
+        instruction = f"Harmful object detected: {harmful_label} — please move back."
+    else:
+        safety_status = "Safe"
+        if coverage_ratio >= 0.6:
+            instruction = "Path is blocked. Please step back."
+        elif all((gy, mid_col) in zones_covered for gy in range(grid_rows)) and not any((gy, gx) in zones_covered for gy in range(grid_rows) for gx in [*left_cols, *right_cols]):
+            instruction = "Obstacle ahead — move left or right"
+        elif zones_covered == {center_zone}:
+            instruction = "Obstacle ahead — stop"
+        elif any((mid_row, x) in zones_covered for x in left_cols) and not any((mid_row, x) in zones_covered for x in right_cols):
+            instruction = "Obstacle on your left — move right"
+        elif any((mid_row, x) in zones_covered for x in right_cols) and not any((mid_row, x) in zones_covered for x in left_cols):
+            instruction = "Obstacle on your right — move left"
+        elif any((mid_row, x) in zones_covered for x in left_cols) and any((mid_row, x) in zones_covered for x in right_cols):
+            instruction = "Obstacle on both sides — look for alternate path"
+        elif any((mid_row + 1, x) in zones_covered for x in range(grid_cols)):
+            instruction = "Obstacle near feet — stop"
+        elif any((grid_rows - 1, x) in zones_covered for x in left_cols):
+            instruction = "Low object on left — careful"
+        elif any((grid_rows - 1, x) in zones_covered for x in right_cols):
+            instruction = "Low object on right — careful"
+        elif any((y, mid_col) in zones_covered for y in range(mid_row)):
+            instruction = "Top-center — heads-up"
+
+    return instruction, safety_status, coverage_ratio
+
+
+def should_send(instruction_history, instruction):
+    """Record instruction in the rolling history and return True if it should go to the client."""
+    instruction_history.append(instruction)
+    if len(instruction_history) > 3:
+        instruction_history.pop(0)
+    return instruction_history.count(instruction) > 1 or instruction == "Move forward"
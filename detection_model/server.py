@@ -2,130 +2,333 @@ import threading
 import socket
 import pickle
 import time
-from ultralytics import YOLO
-from PIL import Image, ImageTk
-import tkinter as tk
-from tkinter import ttk
+import os
+import json
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import cv2
+from guidance import HARMFUL_OBJECTS, harmful_label, zones_for_boxes, decide_instruction, should_send
 
+startup_begin = time.perf_counter()
 
-model = YOLO("best.pt")
-model.verbose = False
+MODEL_WEIGHTS = "best.pt"
+MODEL_ARTIFACT = "best.torchscript"
+MODEL_METADATA = "best.meta.json"
+# Exported at the camera's 4:3 aspect: exported models run at a fixed input size, so a square
+# 640x640 export would spend a third more compute on every 480x640 frame.
+ARTIFACT_IMGSZ = (480, 640)
 
 swap_pairs = [("scissors", "cell phone"), ("cell phone", "scissors"), ("chair", "knife"), ("knife", "chair")]
-swap_map = {}
-for a, b in swap_pairs:
-    id_a = [k for k, v in model.names.items() if v == a]
-    id_b = [k for k, v in model.names.items() if v == b]
-    if id_a and id_b:
-        swap_map[id_a[0]] = id_b[0]
-        swap_map[id_b[0]] = id_a[0]
+harmful_objects = list(HARMFUL_OBJECTS)
 
 grid_rows, grid_cols = 5, 5
-center_zone = (2, 2)
 confidence_threshold = 0.5
 
-cap = cv2.VideoCapture(0)
 instruction_history = []
+first_instruction_sent = False
 
 server_ip = '0.0.0.0'
 server_port = 12345
-server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-server_socket.bind((server_ip, server_port))
-server_socket.listen(1)
+
+control_ip = '127.0.0.1'
+control_port = 12346
+
+def log_startup(step):
+    print(f"[startup] {step} ready after {time.perf_counter() - startup_begin:.2f}s")
+
+def build_swap_map(names, pairs=swap_pairs):
+    swap_map = {}
+    for a, b in pairs:
+        id_a = [k for k, v in names.items() if v == a]
+        id_b = [k for k, v in names.items() if v == b]
+        if id_a and id_b:
+            swap_map[id_a[0]] = id_b[0]
+            swap_map[id_b[0]] = id_a[0]
+    return swap_map
+
+def artifact_is_stale():
+    if not (os.path.exists(MODEL_ARTIFACT) and os.path.exists(MODEL_METADATA)):
+        return True
+    with open(MODEL_METADATA) as f:
+        if tuple(json.load(f).get("imgsz", ())) != ARTIFACT_IMGSZ:
+            return True
+    if not os.path.exists(MODEL_WEIGHTS):
+        # Deployed with only the precompiled artifact: nothing to rebuild from.
+        return False
+    return os.path.getmtime(MODEL_WEIGHTS) > min(os.path.getmtime(MODEL_ARTIFACT), os.path.getmtime(MODEL_METADATA))
+
+def build_artifact():
+    # One-time cost: export best.pt to TorchScript and cache the class names next to it,
+    # so later boots skip the PyTorch checkpoint unpickling.
+    from ultralytics import YOLO
+    pt_model = YOLO(MODEL_WEIGHTS)
+    pt_model.export(format="torchscript", imgsz=ARTIFACT_IMGSZ)
+    with open(MODEL_METADATA, "w") as f:
+        json.dump({"names": dict(pt_model.names), "imgsz": list(ARTIFACT_IMGSZ)}, f)
+
+def warm_up(candidate_model, threshold, frame=None):
+    # Pays the lazy initialization cost and doubles as the health check for hot-swapped models:
+    # the model has to run on a blank frame (and the latest camera frame, if any) and return boxes.
+    frames = [np.zeros((480, 640, 3), dtype=np.uint8)]
+    if frame is not None:
+        frames.append(frame)
+    for warm_frame in frames:
+        results = candidate_model(warm_frame, conf=threshold, verbose=False)
+        if not results or results[0].boxes is None:
+            raise RuntimeError("warm-up inference returned no detection output")
+
+def load_model():
+    if artifact_is_stale():
+        print("[startup] building precompiled model artifact (first run only)")
+        build_artifact()
+    from ultralytics import YOLO
+    with open(MODEL_METADATA) as f:
+        metadata = json.load(f)
+    names = {int(k): v for k, v in metadata["names"].items()}
+    # Built fresh from swap_pairs on every boot so edits to them are never masked by the cache.
+    swap_map = build_swap_map(names)
+    loaded_model = YOLO(MODEL_ARTIFACT, task="detect")
+    warm_up(loaded_model, confidence_threshold)
+    log_startup("model")
+    return loaded_model, names, swap_map
+
+def open_camera():
+    camera = cv2.VideoCapture(0)
+    camera.read()
+    log_startup("camera")
+    return camera
+
+def open_listener():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind((server_ip, server_port))
+    sock.listen(1)
+    log_startup("socket (listening)")
+    return sock
+
+
+class DetectionConfig:
+    """Everything process_frame needs for one frame. Treated as immutable: changes build a new one."""
+
+    def __init__(self, model, names, swap_map, grid_rows, grid_cols, confidence_threshold, harmful_objects, source):
+        self.model = model
+        self.names = names
+        self.swap_map = swap_map
+        self.grid_rows = grid_rows
+        self.grid_cols = grid_cols
+        self.confidence_threshold = confidence_threshold
+        self.harmful_objects = harmful_objects
+        self.source = source
+
+    def replace(self, **changes):
+        fields = dict(self.__dict__)
+        fields.update(changes)
+        return DetectionConfig(**fields)
+
+
+# Double buffer: process_frame reads active_config once per frame; a swap only rebinds the name,
+# so a frame always sees one consistent config. previous_config keeps the last model for rollback;
+# only its model fields are restored, so threshold and grid changes made since are kept.
+active_config = None
+previous_config = None
+config_lock = threading.Lock()
+# process_frame only copies a camera frame into latest_frame while a model load asks for one.
+latest_frame = None
+frame_wanted = threading.Event()
+
+CONTROL_KEYS = {"model", "threshold", "grid", "swap_pairs", "harmful_objects", "command"}
+
+def swap_config(changes, quiet=False):
+    global active_config, previous_config
+    with config_lock:
+        if "model" in changes:
+            previous_config = active_config
+        active_config = active_config.replace(**changes)
+    if not quiet:
+        print(f"[control] now serving {active_config.source} at threshold {active_config.confidence_threshold}")
+
+def rollback_config(reason):
+    global active_config, previous_config
+    with config_lock:
+        if previous_config is None:
+            return False
+        failed = active_config
+        active_config = active_config.replace(
+            model=previous_config.model,
+            names=previous_config.names,
+            swap_map=previous_config.swap_map,
+            source=previous_config.source,
+        )
+        previous_config = None
+    print(f"[control] rolled back from {failed.source} to {active_config.source}: {reason}")
+    return True
+
+def is_string_list(value):
+    return isinstance(value, list) and all(isinstance(item, str) for item in value)
+
+def prepare_changes(request):
+    # Runs on the control thread; everything slow (loading, warm-up) happens here, off the frame loop.
+    global latest_frame
+    unknown = set(request) - CONTROL_KEYS
+    if unknown:
+        raise ValueError(f"unknown keys: {', '.join(sorted(unknown))}")
+    if "command" in request:
+        raise ValueError(f"unknown command: {request['command']}")
+    if not request:
+        raise ValueError("no changes requested")
+    changes = {}
+    if "threshold" in request:
+        threshold = float(request["threshold"])
+        if not 0 <= threshold <= 1:
+            raise ValueError("threshold must be between 0 and 1")
+        changes["confidence_threshold"] = threshold
+    if "grid" in request:
+        rows, cols = (int(n) for n in request["grid"])
+        # The zone rules need a centre row and column with at least two rows below the centre.
+        if rows < 5 or cols < 5 or rows % 2 == 0 or cols % 2 == 0:
+            raise ValueError("grid rows and columns must be odd and at least 5")
+        changes["grid_rows"], changes["grid_cols"] = rows, cols
+    if "harmful_objects" in request:
+        if not is_string_list(request["harmful_objects"]):
+            raise ValueError("harmful_objects must be a list of class names")
+        changes["harmful_objects"] = list(request["harmful_objects"])
+    if "swap_pairs" in request:
+        pairs = request["swap_pairs"]
+        if not isinstance(pairs, list) or not all(is_string_list(pair) and len(pair) == 2 for pair in pairs):
+            raise ValueError("swap_pairs must be a list of [class, class] pairs")
+    if "model" in request:
+        from ultralytics import YOLO
+        latest_frame = None
+        frame_wanted.set()
+        path = request["model"]
+        new_model = YOLO(path, task="detect")
+        changes["model"] = new_model
+        changes["names"] = dict(new_model.names)
+        changes["source"] = path
+    names = changes.get("names", active_config.names)
+    if "swap_pairs" in request:
+        changes["swap_map"] = build_swap_map(names, [tuple(pair) for pair in request["swap_pairs"]])
+    elif "names" in changes:
+        changes["swap_map"] = build_swap_map(names)
+    if "model" in changes:
+        frame_wanted.clear()
+        warm_up(changes["model"], changes.get("confidence_threshold", active_config.confidence_threshold), latest_frame)
+    return changes
+
+def handle_control_request(request):
+    if request.get("command") == "rollback":
+        if rollback_config("requested over control channel"):
+            return {"status": "ok", "source": active_config.source}
+        return {"status": "error", "error": "no previous config to roll back to"}
+    try:
+        changes = prepare_changes(request)
+    except Exception as e:
+        # The active config was never touched, so detection carries on with it.
+        return {"status": "error", "error": f"{type(e).__name__}: {e}", "source": active_config.source}
+    finally:
+        frame_wanted.clear()
+    swap_config(changes)
+    return {"status": "ok", "source": active_config.source}
+
+def serve_control_channel():
+    # One JSON object per line, e.g. {"model": "new.pt", "threshold": 0.4, "grid": [5, 5]}.
+    control_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    control_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    try:
+        control_socket.bind((control_ip, control_port))
+        control_socket.listen(1)
+    except OSError as e:
+        print(f"[control] could not listen on {control_ip}:{control_port}, hot-swap disabled: {e}")
+        control_socket.close()
+        return
+    while True:
+        conn, _ = control_socket.accept()
+        try:
+            with conn, conn.makefile("rw") as stream:
+                for line in stream:
+                    if not line.strip():
+                        continue
+                    try:
+                        request = json.loads(line)
+                        if not isinstance(request, dict):
+                            raise ValueError("expected a JSON object")
+                        reply = handle_control_request(request)
+                    except ValueError as e:
+                        reply = {"status": "error", "error": f"invalid request: {e}"}
+                    stream.write(json.dumps(reply) + "\n")
+                    stream.flush()
+        except OSError as e:
+            # A control client that goes away mid-request must not take the channel down with it.
+            print(f"[control] connection closed: {e}")
+
+
+with ThreadPoolExecutor(max_workers=3) as startup_pool:
+    model_future = startup_pool.submit(load_model)
+    camera_future = startup_pool.submit(open_camera)
+    socket_future = startup_pool.submit(open_listener)
+    model, names, swap_map = model_future.result()
+    cap = camera_future.result()
+    server_socket = socket_future.result()
+
+server_ready_time = time.perf_counter() - startup_begin
+print(f"[startup] server ready (model, camera, listening) after {server_ready_time:.2f}s, waiting for client")
+
+# Accept on the main thread only once everything else is up, so a startup failure above
+# surfaces immediately instead of waiting behind a blocked accept().
+client_wait_begin = time.perf_counter()
 client_socket, client_address = server_socket.accept()
+client_wait_time = time.perf_counter() - client_wait_begin
+print(f"[startup] client {client_address[0]} connected after waiting {client_wait_time:.2f}s")
 
-harmful_objects = ["knife", "scissors"]
-detected_harmful_object = None
+active_config = DetectionConfig(model, names, swap_map, grid_rows, grid_cols, confidence_threshold, harmful_objects, MODEL_ARTIFACT)
 
-last_detection_time = time.time()
+from PIL import Image, ImageTk
+import tkinter as tk
 
 def process_frame():
-    global detected_harmful_object, last_detection_time
+    global latest_frame, first_instruction_sent
     ret, frame = cap.read()
     if not ret:
         root.after(10, process_frame)
         return
+    if frame_wanted.is_set():
+        latest_frame = frame.copy()
+
+    config = active_config
+    grid_rows, grid_cols = config.grid_rows, config.grid_cols
 
     frame_h, frame_w = frame.shape[:2]
     grid_w = frame_w / grid_cols
     grid_h = frame_h / grid_rows
 
-    results = model(frame, conf=confidence_threshold)
+    try:
+        results = config.model(frame, conf=config.confidence_threshold, verbose=False)
+    except Exception as e:
+        if not rollback_config(f"inference failed: {e}"):
+            raise
+        root.after(10, process_frame)
+        return
     objects = results[0].boxes
 
-    zones_covered = set()
-    detected_classes = set()
-
-    harmful_object_detected = False
-
+    labels = []
     for box in objects:
-        x1, y1, x2, y2 = box.xyxy[0].tolist()
-        x1 = max(0, min(frame_w - 1, x1))
-        y1 = max(0, min(frame_h - 1, y1))
-        x2 = max(0, min(frame_w - 1, x2))
-        y2 = max(0, min(frame_h - 1, y2))
-
-        start_col = int(x1 // grid_w)
-        end_col = int(x2 // grid_w)
-        start_row = int(y1 // grid_h)
-        end_row = int(y2 // grid_h)
-
-        for row in range(start_row, end_row + 1):
-            for col in range(start_col, end_col + 1):
-                if 0 <= row < grid_rows and 0 <= col < grid_cols:
-                    zones_covered.add((row, col))
-
         cls_id = int(box.cls[0])
-        swapped_cls_id = swap_map[cls_id] if cls_id in swap_map else cls_id
-        label = model.names[swapped_cls_id]
-        detected_classes.add(label)
-
-        if label in harmful_objects:
-            harmful_object_detected = True
-            detected_harmful_object = label
-
-    if len(objects) > 0:
-        last_detection_time = time.time()
-
-    instruction = "Move forward"
-    coverage_ratio = len(zones_covered) / (grid_rows * grid_cols)
-
-    if harmful_object_detected:
-        safety_status = "Unsafe"
-        instruction = f"Harmful object detected: {detected_harmful_object} — please move back."
-    else:
-        safety_status = "Safe"
-        if coverage_ratio >= 0.6:
-            instruction = "Path is blocked. Please step back."
-        elif all((gy, gx) in zones_covered for gy in range(grid_rows) for gx in [2]) and not any((gy, gx) in zones_covered for gy in range(grid_rows) for gx in [0, 1, 3, 4]):
-            instruction = "Obstacle ahead — move left or right"
-        elif zones_covered == {center_zone}:
-            instruction = "Obstacle ahead — stop"
-        elif any((2, x) in zones_covered for x in [0, 1]) and not any((2, x) in zones_covered for x in [3, 4]):
-            instruction = "Obstacle on your left — move right"
-        elif any((2, x) in zones_covered for x in [3, 4]) and not any((2, x) in zones_covered for x in [0, 1]):
-            instruction = "Obstacle on your right — move left"
-        elif any((2, x) in zones_covered for x in [0, 1]) and any((2, x) in zones_covered for x in [3, 4]):
-            instruction = "Obstacle on both sides — look for alternate path"
-        elif any((3, x) in zones_covered for x in range(grid_cols)):
-            instruction = "Obstacle near feet — stop"
-        elif any((4, x) in zones_covered for x in [0, 1]):
-            instruction = "Low object on left — careful"
-        elif any((4, x) in zones_covered for x in [3, 4]):
-            instruction = "Low object on right — careful"
-        elif (1, 2) in zones_covered or (0, 2) in zones_covered:
-            instruction = "Top-center — heads-up"
-        elif time.time() - last_detection_time > 5:
-            instruction = "Move forward"
-
-    instruction_history.append(instruction)
-    if len(instruction_history) > 3:
-        instruction_history.pop(0)
-
-    if instruction_history.count(instruction) > 1 or instruction == "Move forward":
+        swapped_cls_id = config.swap_map[cls_id] if cls_id in config.swap_map else cls_id
+        labels.append(config.names[swapped_cls_id])
+    detected_classes = set(labels)
+    detected_harmful_object = harmful_label(labels, config.harmful_objects)
+
+    zones_covered = zones_for_boxes([box.xyxy[0].tolist() for box in objects], frame_w, frame_h, grid_rows, grid_cols)
+    instruction, safety_status, coverage_ratio = decide_instruction(zones_covered, detected_harmful_object, grid_rows, grid_cols)
+
+    if should_send(instruction_history, instruction):
         serialized_instruction = pickle.dumps(instruction)
         client_socket.sendall(serialized_instruction)
+        if not first_instruction_sent:
+            first_instruction_sent = True
+            total = time.perf_counter() - startup_begin
+            print(f"[startup] first instruction sent after {total:.2f}s "
+                  f"(server ready {server_ready_time:.2f}s, client wait {client_wait_time:.2f}s, "
+                  f"after connect {total - server_ready_time - client_wait_time:.2f}s)")
 
     for row in range(grid_rows):
         for col in range(grid_cols):
@@ -148,12 +351,19 @@ def process_frame():
     coverage_label.config(text=f"Coverage: {coverage_ratio * 100:.2f}%")
     detected_label.config(text=f"Detected: {', '.join(detected_classes)}")
     safety_label.config(text=f"Safety Status: {safety_status}")
+    current_threshold = active_config.confidence_threshold
+    if abs(confidence_slider.get() - current_threshold) > 0.005:
+        confidence_slider.set(current_threshold)
+    confidence_label.config(text=f"Confidence Threshold: {current_threshold}")
     root.after(10, process_frame)
 
 def update_confidence(val):
-    global confidence_threshold
-    confidence_threshold = float(val)
-    confidence_label.config(text=f"Confidence Threshold: {confidence_threshold}")
+    threshold = float(val)
+    # Within one slider step of the active value means the slider is only being synced
+    # to a threshold set over the control channel; keep that exact value.
+    if abs(threshold - active_config.confidence_threshold) > 0.005:
+        swap_config({"confidence_threshold": threshold}, quiet=True)
+        confidence_label.config(text=f"Confidence Threshold: {threshold}")
 
 root = tk.Tk()
 root.title("YOLOv8 Object Detection UI")
@@ -189,10 +399,11 @@ pause_button.pack(side="left", padx=20)
 resume_button = tk.Button(button_frame, text="Resume", command=lambda: cap.open(0))
 resume_button.pack(side="right", padx=20)
 
+log_startup("gui")
+threading.Thread(target=serve_control_channel, daemon=True).start()
 threading.Thread(target=process_frame, daemon=True).start()
 root.mainloop()
 
 cap.release()
 client_socket.close()
 server_socket.close()
-
@@ -0,0 +1,82 @@
+import random
+
+import pytest
+
+from guidance import harmful_label, zones_for_boxes, decide_instruction, should_send
+
+
+def reference_instruction(zones_covered):
+    # The 5x5 rules as they were written in server.py before they moved to guidance.py.
+    coverage_ratio = len(zones_covered) / 25
+    if coverage_ratio >= 0.6:
+        return "Path is blocked. Please step back."
+    elif all((gy, gx) in zones_covered for gy in range(5) for gx in [2]) and not any((gy, gx) in zones_covered for gy in range(5) for gx in [0, 1, 3, 4]):
+        return "Obstacle ahead — move left or right"
+    elif zones_covered == {(2, 2)}:
+        return "Obstacle ahead — stop"
+    elif any((2, x) in zones_covered for x in [0, 1]) and not any((2, x) in zones_covered for x in [3, 4]):
+        return "Obstacle on your left — move right"
+    elif any((2, x) in zones_covered for x in [3, 4]) and not any((2, x) in zones_covered for x in [0, 1]):
+        return "Obstacle on your right — move left"
+    elif any((2, x) in zones_covered for x in [0, 1]) and any((2, x) in zones_covered for x in [3, 4]):
+        return "Obstacle on both sides — look for alternate path"
+    elif any((3, x) in zones_covered for x in range(5)):
+        return "Obstacle near feet — stop"
+    elif any((4, x) in zones_covered for x in [0, 1]):
+        return "Low object on left — careful"
+    elif any((4, x) in zones_covered for x in [3, 4]):
+        return "Low object on right — careful"
+    elif (1, 2) in zones_covered or (0, 2) in zones_covered:
+        return "Top-center — heads-up"
+    return "Move forward"
+
+
+@pytest.mark.parametrize("zones, expected", [
+    (set(), "Move forward"),
+    ({(r, 2) for r in range(5)}, "Obstacle ahead — move left or right"),
+    ({(2, 2)}, "Obstacle ahead — stop"),
+    ({(2, 0), (2, 1)}, "Obstacle on your left — move right"),
+    ({(2, 4)}, "Obstacle on your right — move left"),
+    ({(2, 0), (2, 4)}, "Obstacle on both sides — look for alternate path"),
+    ({(3, 2)}, "Obstacle near feet — stop"),
+    ({(4, 0)}, "Low object on left — careful"),
+    ({(4, 3)}, "Low object on right — careful"),
+    ({(0, 2)}, "Top-center — heads-up"),
+    ({(r, c) for r in range(5) for c in range(3)}, "Path is blocked. Please step back."),
+])
+def test_decide_instruction_known_zones(zones, expected):
+    instruction, safety_status, _ = decide_instruction(zones, None, 5, 5)
+    assert instruction == expected
+    assert safety_status == "Safe"
+
+
+def test_decide_instruction_matches_original_5x5_rules():
+    rng = random.Random(0)
+    cells = [(r, c) for r in range(5) for c in range(5)]
+    for _ in range(20000):
+        zones = {cell for cell in cells if rng.random() < rng.choice([0.05, 0.15, 0.3, 0.6])}
+        assert decide_instruction(zones, None, 5, 5)[0] == reference_instruction(zones)
+
+
+def test_harmful_object_overrides_zones():
+    instruction, safety_status, _ = decide_instruction({(2, 2)}, "knife", 5, 5)
+    assert instruction == "Harmful object detected: knife — please move back."
+    assert safety_status == "Unsafe"
+
+
+def test_harmful_label_picks_last_harmful_detection():
+    assert harmful_label(["chair", "knife", "dog", "scissors"]) == "scissors"
+    assert harmful_label(["chair", "dog"]) is None
+    assert harmful_label(["knife"], ["scissors"]) is None
+
+
+def test_zones_for_boxes_clamps_to_frame():
+    assert zones_for_boxes([(-50, -50, 10, 10)], 640, 480, 5, 5) == {(0, 0)}
+    assert zones_for_boxes([(300, 200, 330, 280)], 640, 480, 5, 5) == {(2, 2)}
+
+
+def test_should_send_needs_repeat_except_move_forward():
+    history = []
+    assert should_send(history, "Move forward")
+    assert not should_send(history, "Obstacle ahead — stop")
+    assert should_send(history, "Obstacle ahead — stop")